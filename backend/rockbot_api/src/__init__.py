@@ -1,24 +1,41 @@
 import os
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from sqlalchemy import event
+from .config import get_config
 from .extensions import db, migrate
+from .json_provider import OrjsonProvider
+
+
+def _set_sqlite_pragmas(dbapi_conn, _):
+    # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.execute('PRAGMA cache_size=-65536')
+    cursor.close()
+
+
+def _scan_dist(dist_dir):
+    """Every file in the frontend build, as URL-style paths relative to dist_dir"""
+    files = set()
+    for root, _, names in os.walk(dist_dir):
+        rel_root = os.path.relpath(root, dist_dir).replace(os.sep, '/')
+        for name in names:
+            files.add(name if rel_root == '.' else f"{rel_root}/{name}")
+    return files
 
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
 
     # --------------------
     # Config
     # --------------------
-    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-
-    # Instance folder and SQLite DB
-    instance_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance')
-    os.makedirs(instance_dir, exist_ok=True)
-    db_path = os.path.join(instance_dir, 'rockbot.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.from_object(get_config())
 
     # --------------------
     # Enable CORS
@@ -31,6 +48,9 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
 
+    with app.app_context():
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+
     # --------------------
     # Import models AFTER db.init_app
     # --------------------
@@ -53,18 +73,27 @@ def create_app():
     # --------------------
     # Serve frontend (Vite build)
     # --------------------
-    dist_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../frontend/rockbot-ui/dist'))
+    dist_dir = app.config['FRONTEND_DIST_DIR']
+
+    # Scan the build once instead of stat()ing on every request
+    dist_files = _scan_dist(dist_dir)
 
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve_frontend(path):
-        # If the requested file exists (e.g. JS, CSS, image), serve it
-        requested_path = os.path.join(dist_dir, path)
-        index_path = os.path.join(dist_dir, 'index.html')
+        nonlocal dist_files
+        # Pick up a rebuilt frontend without restarting the dev server. The new
+        # set is swapped in whole so concurrent requests never see it half-built.
+        if app.debug and path and path not in dist_files:
+            dist_files = _scan_dist(dist_dir)
+        files = dist_files
 
-        if path != "" and os.path.exists(requested_path):
-            return send_from_directory(dist_dir, path)
-        elif os.path.exists(index_path):
+        # If the requested file exists (e.g. JS, CSS, image), serve it.
+        # Vite fingerprints everything under assets/, so those can be cached for good.
+        if path in files:
+            max_age = 31536000 if path.startswith('assets/') else None
+            return send_from_directory(dist_dir, path, max_age=max_age)
+        elif 'index.html' in files:
             return send_from_directory(dist_dir, 'index.html')
         else:
             return "Frontend build not found. Please run 'npm run build' inside frontend/rockbot-ui.", 404
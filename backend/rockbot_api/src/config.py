@@ -1,8 +1,35 @@
 import os
+import secrets
+from functools import lru_cache
+from pathlib import Path
 
-basedir = os.path.abspath(os.path.dirname(__file__))
+basedir = Path(__file__).resolve().parent
+instance_dir = basedir.parent / 'instance'
+dist_dir = basedir.parents[2] / 'frontend' / 'rockbot-ui' / 'dist'
 
 class Config:
+    # Set SECRET_KEY in the environment for anything beyond local development.
+    # Without it each process signs with a random key, so signed data does not
+    # survive a restart or carry across workers, but the key is never public.
+    SECRET_KEY = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+
     # This will place the DB inside instance/rockbot.db
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, '..', 'instance', 'rockbot.db')
+    SQLALCHEMY_DATABASE_URI = f"sqlite:///{instance_dir / 'rockbot.db'}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Keep a pool of SQLite connections that worker threads can share
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 8,
+        'pool_pre_ping': True,
+        'connect_args': {'check_same_thread': False},
+    }
+
+    # Vite build served by the catch-all frontend route
+    FRONTEND_DIST_DIR = str(dist_dir)
+
+
+@lru_cache(maxsize=None)
+def get_config():
+    """Config for this process; the instance folder is only created on the first call"""
+    instance_dir.mkdir(parents=True, exist_ok=True)
+    return Config
@@ -0,0 +1,28 @@
+# src/json_provider.py
+import orjson
+from flask.json.provider import JSONProvider
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    ``jsonify`` goes through ``response``, which hands orjson's bytes straight
+    to the response object instead of encoding to ``str`` and back to utf-8.
+    """
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=ORJSON_OPTIONS, default=str),
+            mimetype=self.mimetype,
+        )
@@ -1,11 +1,13 @@
 # src/models/conversation.py
 from datetime import datetime
-import json
+import orjson
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import raiseload
 from src.extensions import db
 
 class Conversation(db.Model):
     __tablename__ = "conversation"
-    __table_args__ = {'extend_existing': True}
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False, default="New Conversation")
@@ -14,17 +16,27 @@ class Conversation(db.Model):
 
     messages = db.relationship("Message", backref="conversation", lazy=True, cascade="all, delete-orphan")
 
-    def to_dict(self):
+    def to_dict(self, message_count=None):
+        # Pass message_count when it is already known (see message_counts) to
+        # avoid lazy-loading the whole messages relationship just to count it.
+        if message_count is None:
+            message_count = len(self.messages)
+        # Datetimes are left as-is: the orjson provider writes them as ISO 8601
+        # in C, byte-identical to isoformat() for these naive UTC values.
         return {
             "id": self.id,
             "title": self.title,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
-            "message_count": len(self.messages),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "message_count": message_count,
         }
 
+_MESSAGE_KEYS = ("id", "conversation_id", "role", "content", "timestamp", "metadata")
+
 class Message(db.Model):
     __tablename__ = "message"
+    # Serves "messages of a conversation in order" as an index range scan
+    __table_args__ = (db.Index("ix_message_conv_ts", "conversation_id", "timestamp"),)
 
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey("conversation.id"), nullable=False)
@@ -39,6 +51,54 @@ class Message(db.Model):
             "conversation_id": self.conversation_id,
             "role": self.role,
             "content": self.content,
-            "timestamp": self.timestamp.isoformat(),
-            "metadata": json.loads(self.message_metadata) if self.message_metadata else None,
+            "timestamp": self.timestamp,
+            "metadata": orjson.loads(self.message_metadata) if self.message_metadata else None,
         }
+
+    @classmethod
+    def dicts_from_rows(cls, rows):
+        """Same shape as to_dict(), built from plain rows of conversation_message_rows().
+
+        Skips ORM instances, the identity map and instrumented attribute access.
+        """
+        dicts = []
+        for row in rows:
+            data = dict(zip(_MESSAGE_KEYS, row))
+            data["metadata"] = orjson.loads(data["metadata"]) if data["metadata"] else None
+            dicts.append(data)
+        return dicts
+
+
+# Built once at import; SQLAlchemy's compiled cache then reuses its SQL on every call
+_conversation_message_rows_stmt = (
+    select(
+        Message.id,
+        Message.conversation_id,
+        Message.role,
+        Message.content,
+        Message.timestamp,
+        Message.message_metadata,
+    )
+    .where(Message.conversation_id == bindparam("cid"))
+    .order_by(Message.timestamp)
+)
+
+
+def conversation_message_rows(conversation_id):
+    """Column rows (not ORM objects) for a conversation's messages in chronological order."""
+    return db.session.execute(_conversation_message_rows_stmt, {"cid": conversation_id}).all()
+
+
+def message_counts(conversation_ids=None):
+    """Map conversation id -> number of messages using one grouped query."""
+    query = db.session.query(Message.conversation_id, func.count(Message.id)).group_by(Message.conversation_id)
+    if conversation_ids is not None:
+        query = query.filter(Message.conversation_id.in_(conversation_ids))
+    return dict(query.all())
+
+
+def strict_loading(query):
+    """Turn lazy loads into errors under DEBUG so new N+1s fail loudly in development."""
+    if current_app.debug:
+        return query.options(raiseload("*"))
+    return query
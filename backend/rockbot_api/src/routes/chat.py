@@ -1,17 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from src.extensions import db
-from src.models.conversation import Conversation, Message
+from src.models.conversation import Conversation, Message, message_counts, strict_loading, conversation_message_rows
 from src.services.ai_service import rockbot_ai
-import json
+import hashlib
+import orjson
 from datetime import datetime
 
 chat_bp = Blueprint('chat', __name__)
 
+# Agent metadata never changes within a process, so serialize it once
+_AGENTS_JSON = orjson.dumps({
+    agent_type: {
+        'name': agent_data['name'],
+        'capabilities': agent_data['capabilities']
+    }
+    for agent_type, agent_data in rockbot_ai.agents.items()
+})
+_AGENTS_ETAG = hashlib.blake2b(_AGENTS_JSON, digest_size=8).hexdigest()
+
 @chat_bp.route('/conversations', methods=['GET'])
 def get_conversations():
     """Get all conversations"""
-    conversations = Conversation.query.order_by(Conversation.updated_at.desc()).all()
-    return jsonify([conv.to_dict() for conv in conversations])
+    conversations = strict_loading(Conversation.query).order_by(Conversation.updated_at.desc()).all()
+    counts = message_counts()
+    return jsonify([conv.to_dict(counts.get(conv.id, 0)) for conv in conversations])
 
 
 @chat_bp.route('/conversations', methods=['POST'])
@@ -24,18 +36,18 @@ def create_conversation():
     db.session.add(conversation)
     db.session.commit()
     
-    return jsonify(conversation.to_dict()), 201
+    return jsonify(conversation.to_dict(0)), 201
 
 
 @chat_bp.route('/conversations/<int:conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     """Get a specific conversation with messages"""
     conversation = Conversation.query.get_or_404(conversation_id)
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
+    messages = conversation_message_rows(conversation_id)
     
     return jsonify({
-        'conversation': conversation.to_dict(),
-        'messages': [msg.to_dict() for msg in messages]
+        'conversation': conversation.to_dict(len(messages)),
+        'messages': Message.dicts_from_rows(messages)
     })
 
 
@@ -66,7 +78,7 @@ def add_message(conversation_id):
         conversation_id=conversation_id,
         role=role,
         content=content,
-        message_metadata=json.dumps(metadata) if metadata else None
+        message_metadata=orjson.dumps(metadata).decode() if metadata else None
     )
     
     db.session.add(message)
@@ -87,56 +99,148 @@ def chat():
     if not message:
         return jsonify({'error': 'Message is required'}), 400
     
-    # Create new conversation if not provided
-    if not conversation_id:
+    sent_at = datetime.utcnow()
+
+    # Create new conversation if not provided. It is only added to the session
+    # after the AI call so no SQLite write lock is held while waiting on it.
+    is_new = not conversation_id
+    if is_new:
         conversation = Conversation(title=message[:50] + "..." if len(message) > 50 else message)
-        db.session.add(conversation)
-        db.session.flush()
-        conversation_id = conversation.id
     else:
         conversation = Conversation.query.get_or_404(conversation_id)
-    
-    # Add user message
-    user_message = Message(
-        conversation_id=conversation_id,
-        role='user',
-        content=message
-    )
-    db.session.add(user_message)
+
+    if data.get('stream'):
+        return _stream_chat(conversation, message, agent_type, sent_at)
     
     # Generate AI response (synchronous call — no async loop)
     try:
-        ai_result = rockbot_ai.generate_response(message, conversation_id, agent_type)
+        ai_result = rockbot_ai.generate_response(message, conversation.id, agent_type)
         
-        ai_response = ai_result.get('response', 'No response generated.')
+        ai_response = ai_result.response or 'No response generated.'
         metadata = {
-            'agent_used': ai_result.get('agent_used'),
-            'agent_name': ai_result.get('agent_name'),
-            'capabilities': ai_result.get('capabilities'),
-            'success': ai_result.get('success', True)
+            'agent_used': ai_result.agent_used,
+            'agent_name': ai_result.agent_name,
+            'capabilities': ai_result.capabilities,
+            'success': ai_result.success
         }
         
     except Exception as e:
         ai_response = f"I apologize, but I encountered an error: {str(e)}"
         metadata = {'error': str(e), 'success': False}
     
-    # Add AI response
+    # Conversation and both messages go out in a single flush/commit
+    user_message = Message(
+        conversation=conversation,
+        role='user',
+        content=message,
+        timestamp=sent_at
+    )
     ai_message = Message(
-        conversation_id=conversation_id,
+        conversation=conversation,
         role='assistant',
         content=ai_response,
-        message_metadata=json.dumps(metadata)
+        message_metadata=orjson.dumps(metadata).decode()
     )
-    db.session.add(ai_message)
+    db.session.add_all([conversation, user_message, ai_message])
     
-    conversation.updated_at = datetime.utcnow()
-    db.session.commit()
-    
-    return jsonify({
+    if not is_new:
+        conversation.updated_at = datetime.utcnow()
+
+    # Serialize between flush and commit: ids are populated by the INSERTs and
+    # the objects have not been expired yet, so nothing is re-selected.
+    db.session.flush()
+    conversation_id = conversation.id
+    payload = {
         'conversation_id': conversation_id,
         'user_message': user_message.to_dict(),
         'ai_response': ai_message.to_dict()
-    })
+    }
+    db.session.commit()
+
+    # A new conversation had no id during the AI call, so seed its memory now
+    if is_new and metadata['success']:
+        rockbot_ai.record_turn(conversation_id, message, ai_response)
+    
+    return jsonify(payload)
+
+
+def _sse(payload, event=None):
+    """Format one Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {orjson.dumps(payload).decode()}\n\n"
+
+
+def _stream_chat(conversation, message, agent_type, sent_at):
+    """Stream the AI reply as Server-Sent Events and save it when the stream ends"""
+    # Commit the user turn first so a new conversation has an id to stream
+    # under and the question is kept even if the client goes away
+    user_message = Message(
+        conversation=conversation,
+        role='user',
+        content=message,
+        timestamp=sent_at
+    )
+    db.session.add_all([conversation, user_message])
+    conversation.updated_at = datetime.utcnow()
+    db.session.flush()
+    conversation_id = conversation.id
+    start = {
+        'conversation_id': conversation_id,
+        'user_message': user_message.to_dict()
+    }
+    db.session.commit()
+
+    agent_type = agent_type or rockbot_ai.select_agent(message)
+    agent = rockbot_ai.agents.get(agent_type, rockbot_ai.agents['general'])
+
+    def generate():
+        chunks = []
+        metadata = {
+            'agent_used': agent_type,
+            'agent_name': agent['name'],
+            'capabilities': agent['capabilities'],
+            'success': True
+        }
+        ai_response = None
+        finished = False
+
+        yield _sse(start, 'start')
+        try:
+            for chunk in rockbot_ai.generate_response_stream(message, conversation_id, agent_type):
+                chunks.append(chunk)
+                yield _sse({'delta': chunk})
+            finished = True
+        except Exception as e:
+            metadata = {'error': str(e), 'success': False}
+        finally:
+            # Also runs when the client disconnects, so partial replies are kept;
+            # only a disconnect before the first chunk leaves nothing to save
+            if chunks or finished or not metadata['success']:
+                if chunks:
+                    content = ''.join(chunks)
+                elif metadata['success']:
+                    content = 'No response generated.'
+                else:
+                    content = f"I apologize, but I encountered an error: {metadata['error']}"
+                ai_message = Message(
+                    conversation_id=conversation_id,
+                    role='assistant',
+                    content=content,
+                    message_metadata=orjson.dumps(metadata).decode()
+                )
+                db.session.add(ai_message)
+                conversation.updated_at = datetime.utcnow()
+                db.session.flush()
+                ai_response = ai_message.to_dict()
+                db.session.commit()
+
+        yield _sse({'ai_response': ai_response}, 'done')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 @chat_bp.route('/translate', methods=['POST'])
@@ -151,7 +255,7 @@ def translate():
         return jsonify({'error': 'Text and target_language are required'}), 400
     
     result = rockbot_ai.translate_text(text, target_language, source_language)
-    return jsonify(result)
+    return jsonify(result.to_dict())
 
 
 @chat_bp.route('/task', methods=['POST'])
@@ -164,27 +268,24 @@ def execute_task():
         return jsonify({'error': 'Task description is required'}), 400
     
     result = rockbot_ai.execute_autonomous_task(task_description)
-    return jsonify(result)
+    return jsonify(result.to_dict())
 
 
 @chat_bp.route('/agents', methods=['GET'])
 def get_agents():
     """Get available AI agents"""
-    agents_info = {}
-    for agent_type, agent_data in rockbot_ai.agents.items():
-        agents_info[agent_type] = {
-            'name': agent_data['name'],
-            'capabilities': agent_data['capabilities']
-        }
-    
-    return jsonify(agents_info)
+    response = Response(_AGENTS_JSON, mimetype='application/json')
+    response.set_etag(_AGENTS_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 
 @chat_bp.route('/conversations/<int:conversation_id>/export', methods=['GET'])
 def export_conversation(conversation_id):
     """Export conversation as text for PDF generation"""
     conversation = Conversation.query.get_or_404(conversation_id)
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
+    messages = conversation_message_rows(conversation_id)
     
     export_text = f"Conversation: {conversation.title}\n"
     export_text += f"Created: {conversation.created_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -196,6 +297,6 @@ def export_conversation(conversation_id):
         export_text += f"[{timestamp}] {role_label}: {message.content}\n\n"
     
     return jsonify({
-        'conversation': conversation.to_dict(),
+        'conversation': conversation.to_dict(len(messages)),
         'export_text': export_text
     })
@@ -1,79 +1,86 @@
 from flask import Blueprint, request, jsonify, send_file
-from src.models.conversation import db, Conversation, Message
+from sqlalchemy import or_
+from src.models.conversation import db, Conversation, Message, message_counts, strict_loading, conversation_message_rows
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-import os
-import tempfile
+import io
 from datetime import datetime
 
 export_bp = Blueprint("export", __name__)
 
+
+def _build_styles():
+    """PDF paragraph styles; built once at import and shared by every export"""
+    styles = getSampleStyleSheet()
+
+    # Custom styles
+    title_style = ParagraphStyle(
+        "CustomTitle",
+        parent=styles["Heading1"],
+        fontSize=18,
+        spaceAfter=30,
+        textColor="#2563eb"
+    )
+
+    user_style = ParagraphStyle(
+        "UserMessage",
+        parent=styles["Normal"],
+        fontSize=11,
+        leftIndent=20,
+        rightIndent=20,
+        spaceAfter=12,
+        backColor="#eff6ff",
+        borderColor="#2563eb",
+        borderWidth=1,
+        borderPadding=8
+    )
+
+    assistant_style = ParagraphStyle(
+        "AssistantMessage",
+        parent=styles["Normal"],
+        fontSize=11,
+        leftIndent=20,
+        rightIndent=20,
+        spaceAfter=12,
+        backColor="#f9fafb",
+        borderColor="#6b7280",
+        borderWidth=1,
+        borderPadding=8
+    )
+
+    timestamp_style = ParagraphStyle(
+        "Timestamp",
+        parent=styles["Normal"],
+        fontSize=9,
+        textColor="#6b7280",
+        spaceAfter=6
+    )
+
+    return title_style, user_style, assistant_style, timestamp_style
+
+
+_TITLE_STYLE, _USER_STYLE, _ASSISTANT_STYLE, _TIMESTAMP_STYLE = _build_styles()
+
+
 @export_bp.route("/conversations/<int:conversation_id>/pdf", methods=["GET"])
 def export_conversation_pdf(conversation_id):
     """Export conversation as PDF"""
     conversation = Conversation.query.get_or_404(conversation_id)
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
-
-    # Create temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    temp_file.close()
+    messages = conversation_message_rows(conversation_id)
 
     try:
-        # Create PDF document
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        styles = getSampleStyleSheet()
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=18,
-            spaceAfter=30,
-            textColor="#2563eb"
-        )
-
-        user_style = ParagraphStyle(
-            "UserMessage",
-            parent=styles["Normal"],
-            fontSize=11,
-            leftIndent=20,
-            rightIndent=20,
-            spaceAfter=12,
-            backColor="#eff6ff",
-            borderColor="#2563eb",
-            borderWidth=1,
-            borderPadding=8
-        )
-
-        assistant_style = ParagraphStyle(
-            "AssistantMessage",
-            parent=styles["Normal"],
-            fontSize=11,
-            leftIndent=20,
-            rightIndent=20,
-            spaceAfter=12,
-            backColor="#f9fafb",
-            borderColor="#6b7280",
-            borderWidth=1,
-            borderPadding=8
-        )
-
-        timestamp_style = ParagraphStyle(
-            "Timestamp",
-            parent=styles["Normal"],
-            fontSize=9,
-            textColor="#6b7280",
-            spaceAfter=6
-        )
+        # Build the PDF in memory; nothing is written to disk
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
 
         # Build content
         content = []
 
         # Title
-        content.append(Paragraph(f"Conversation: {conversation.title}", title_style))
-        content.append(Paragraph(f"Created: {conversation.created_at.strftime('%Y-%m-%d %H:%M:%S')}", timestamp_style))
+        content.append(Paragraph(f"Conversation: {conversation.title}", _TITLE_STYLE))
+        content.append(Paragraph(f"Created: {conversation.created_at.strftime('%Y-%m-%d %H:%M:%S')}", _TIMESTAMP_STYLE))
         content.append(Spacer(1, 20))
 
         # Messages
@@ -82,46 +89,40 @@ def export_conversation_pdf(conversation_id):
             timestamp = message.timestamp.strftime("%H:%M:%S")
 
             # Timestamp
-            content.append(Paragraph(f"[{timestamp}] {role_label}:", timestamp_style))
+            content.append(Paragraph(f"[{timestamp}] {role_label}:", _TIMESTAMP_STYLE))
 
             # Message content
-            style = user_style if message.role == "user" else assistant_style
+            style = _USER_STYLE if message.role == "user" else _ASSISTANT_STYLE
             content.append(Paragraph(message.content.replace("\n", "<br/>"), style))
 
             content.append(Spacer(1, 10))
 
         # Build PDF
         doc.build(content)
+        buffer.seek(0)
 
         # Return file
         return send_file(
-            temp_file.name,
+            buffer,
             as_attachment=True,
             download_name=f"conversation-{conversation_id}.pdf",
             mimetype='application/pdf'
         )
 
     except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
         return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
-    finally:
-        # For now, leave the temp file for download
-        pass
-
 
 @export_bp.route("/conversations/<int:conversation_id>/share", methods=["POST"])
 def share_conversation(conversation_id):
     """Create shareable link for conversation"""
     conversation = Conversation.query.get_or_404(conversation_id)
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
+    messages = conversation_message_rows(conversation_id)
 
     # Generate share data
     share_data = {
-        'conversation': conversation.to_dict(),
-        'messages': [msg.to_dict() for msg in messages],
+        'conversation': conversation.to_dict(len(messages)),
+        'messages': Message.dicts_from_rows(messages),
         'shared_at': datetime.utcnow().isoformat(),
         'share_id': f"share_{conversation_id}_{int(datetime.utcnow().timestamp())}"
     }
@@ -142,24 +143,16 @@ def search_conversations():
     if not query:
         return jsonify([])
 
-    # Search in conversation titles
-    title_matches = Conversation.query.filter(
-        Conversation.title.contains(query)
-    ).limit(limit).all()
-
-    # Search in message content
-    message_matches = db.session.query(Conversation).join(Message).filter(
+    # Match on title or on any message content in one query, newest first
+    content_matches = db.session.query(Message.conversation_id).filter(
         Message.content.contains(query)
-    ).distinct().limit(limit).all()
-
-    # Combine and deduplicate results
-    all_matches = {conv.id: conv for conv in title_matches + message_matches}
-    results = list(all_matches.values())
-
-    # Sort by updated_at
-    results.sort(key=lambda x: x.updated_at, reverse=True)
+    )
+    results = strict_loading(Conversation.query).filter(
+        or_(Conversation.title.contains(query), Conversation.id.in_(content_matches))
+    ).order_by(Conversation.updated_at.desc()).limit(limit).all()
 
-    return jsonify([conv.to_dict() for conv in results[:limit]])
+    counts = message_counts([conv.id for conv in results])
+    return jsonify([conv.to_dict(counts.get(conv.id, 0)) for conv in results])
 
 
 @export_bp.route("/conversations/filter", methods=["GET"])
@@ -169,7 +162,7 @@ def filter_conversations():
     end_date = request.args.get('end_date')
     limit = int(request.args.get('limit', 50))
 
-    query = Conversation.query
+    query = strict_loading(Conversation.query)
 
     if start_date:
         try:
@@ -186,5 +179,6 @@ def filter_conversations():
             return jsonify({'error': 'Invalid end_date format'}), 400
 
     conversations = query.order_by(Conversation.updated_at.desc()).limit(limit).all()
+    counts = message_counts([conv.id for conv in conversations])
 
-    return jsonify([conv.to_dict() for conv in conversations])
+    return jsonify([conv.to_dict(counts.get(conv.id, 0)) for conv in conversations])
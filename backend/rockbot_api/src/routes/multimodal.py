@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 import os
-import base64
+import mmap
 import openai
+import pybase64
 from PIL import Image
 import io
 from src.services.ai_service import rockbot_ai
@@ -10,15 +11,103 @@ from src.services.ai_service import rockbot_ai
 multimodal_bp = Blueprint('multimodal', __name__)
 
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'txt', 'doc', 'docx'}
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'pdf', 'txt', 'doc', 'docx'})
+DOCUMENT_CHUNK_SIZE = 64 * 1024
+# Vision models downsample anything bigger server-side, so don't ship it
+VISION_MAX_SIDE = 1024
+# Pillow formats the vision API takes as-is. MPO is the multi-picture JPEG
+# many phones write; it starts with a plain JPEG frame.
+VISION_PASSTHROUGH_MIME = {
+    'JPEG': 'image/jpeg',
+    'MPO': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+_openai_client = None
+
+def file_extension(filename):
+    """Lowercased extension without the dot, or '' if there is none"""
+    dot = filename.rfind('.')
+    return filename[dot + 1:].lower() if dot != -1 else ''
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return file_extension(filename) in ALLOWED_EXTENSIONS
 
 def ensure_upload_folder():
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
 
+def get_openai_client():
+    """Shared OpenAI client so vision calls reuse one HTTP connection pool"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI()
+    return _openai_client
+
+def image_data_url(image_data, mime_type='image/jpeg'):
+    """Base64 data URL for image bytes (any buffer: bytes, mmap, ...)"""
+    # pybase64 uses libbase64's SIMD encoder; the prefix is already in the buffer
+    data_url = bytearray(f'data:{mime_type};base64,'.encode('ascii'))
+    data_url += pybase64.b64encode(image_data)
+    return data_url.decode('ascii')
+
+def vision_data_url(img, image_data):
+    """Data URL for the vision API, shrinking img to VISION_MAX_SIDE first if it is bigger
+
+    image_data holds the original encoded bytes and is sent as-is when no
+    resize is needed and the format is one the API accepts; anything else
+    (BMP, TIFF, ...) is re-encoded.
+    """
+    mime_type = VISION_PASSTHROUGH_MIME.get(img.format)
+    if mime_type and max(img.size) <= VISION_MAX_SIDE:
+        return image_data_url(image_data, mime_type)
+
+    if max(img.size) > VISION_MAX_SIDE:
+        img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        # Keep the alpha channel, which JPEG would flatten
+        img.convert('RGBA').save(buffer, format='WEBP', quality=80)
+        mime_type = 'image/webp'
+    else:
+        img.convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+        mime_type = 'image/jpeg'
+    return image_data_url(buffer.getbuffer(), mime_type)
+
+def file_data_url(filepath):
+    """Vision data URL for an image file; the original is encoded straight from an mmap"""
+    with open(filepath, 'rb') as image_file, \
+            mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_data, \
+            Image.open(image_file) as img:
+        return vision_data_url(img, image_data)
+
+def vision_completion(image_url, prompt, max_tokens):
+    """Ask the vision model about an image and return the text reply"""
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4-vision-preview",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
 @multimodal_bp.route('/upload', methods=['POST'])
 def upload_file():
     """Upload and process files (images, documents)"""
@@ -33,17 +122,25 @@ def upload_file():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Read the upload once; processing works on this buffer, not the saved copy
+        data = file.stream.read()
+
+        # persist=false analyzes the upload without keeping it on disk
+        if request.form.get('persist', 'true').lower() != 'false':
+            filepath = os.path.join(UPLOAD_FOLDER, filename)
+            with open(filepath, 'wb') as out:
+                out.write(data)
+        else:
+            filepath = None
 
-        file_ext = filename.rsplit('.', 1)[1].lower()
+        file_ext = file_extension(filename)
 
         if file_ext in ['png', 'jpg', 'jpeg', 'gif']:
-            result = process_image(filepath)
+            result = process_image(data)
         elif file_ext == 'pdf':
-            result = process_pdf(filepath)
+            result = process_pdf(data)
         else:
-            result = process_document(filepath)
+            result = process_document(data)
 
         return jsonify({
             'filename': filename,
@@ -54,41 +151,19 @@ def upload_file():
 
     return jsonify({'error': 'File type not allowed'}), 400
 
-def process_image(filepath):
+def process_image(data):
     """Process image using OpenAI Vision API"""
     try:
-        with open(filepath, 'rb') as image_file:
-            image_data = image_file.read()
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Analyze this image and describe what you see in detail. Include any text, objects, people, or other notable elements."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=500
-        )
-
-        analysis = response.choices[0].message.content
-
-        with Image.open(filepath) as img:
+        with Image.open(io.BytesIO(data)) as img:
             width, height = img.size
             format_type = img.format
+            image_url = vision_data_url(img, data)
+
+        analysis = vision_completion(
+            image_url,
+            "Analyze this image and describe what you see in detail. Include any text, objects, people, or other notable elements.",
+            max_tokens=500
+        )
 
         return {
             'type': 'image',
@@ -106,9 +181,9 @@ def process_image(filepath):
             'error': f"Image processing failed: {str(e)}"
         }
 
-def process_pdf(filepath):
+def process_pdf(data):
     try:
-        file_size = os.path.getsize(filepath)
+        file_size = len(data)
         return {
             'type': 'pdf',
             'message': 'PDF uploaded successfully. Text extraction not implemented in this demo.',
@@ -122,17 +197,29 @@ def process_pdf(filepath):
             'error': f"PDF processing failed: {str(e)}"
         }
 
-def process_document(filepath):
+def process_document(data):
     try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            content = file.read()
-
-        word_count = len(content.split())
-        char_count = len(content)
+        word_count = 0
+        char_count = 0
+        preview = ''
+        in_word = False
+
+        # Decode and count chunk by chunk so the full text and its word list
+        # are never materialized at once
+        with io.TextIOWrapper(io.BytesIO(data), encoding='utf-8') as file:
+            for chunk in iter(lambda: file.read(DOCUMENT_CHUNK_SIZE), ''):
+                word_count += len(chunk.split())
+                # A word cut by the chunk boundary was counted on both sides
+                if in_word and not chunk[0].isspace():
+                    word_count -= 1
+                in_word = not chunk[-1].isspace()
+                char_count += len(chunk)
+                if len(preview) <= 1000:
+                    preview += chunk[:1001 - len(preview)]
 
         return {
             'type': 'document',
-            'content': content[:1000] + "..." if len(content) > 1000 else content,
+            'content': preview[:1000] + "..." if char_count > 1000 else preview,
             'metadata': {
                 'word_count': word_count,
                 'char_count': char_count
@@ -155,34 +242,7 @@ def analyze_image():
         return jsonify({'error': 'File not found'}), 404
 
     try:
-        with open(filepath, 'rb') as image_file:
-            image_data = image_file.read()
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
-
-        analysis = response.choices[0].message.content
+        analysis = vision_completion(file_data_url(filepath), prompt, max_tokens=1000)
 
         return jsonify({
             'analysis': analysis,
@@ -210,34 +270,7 @@ def chat_with_image():
         return jsonify({'error': 'File not found'}), 404
 
     try:
-        with open(filepath, 'rb') as image_file:
-            image_data = image_file.read()
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": message
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
-
-        ai_response = response.choices[0].message.content
+        ai_response = vision_completion(file_data_url(filepath), message, max_tokens=1000)
 
         return jsonify({
             'response': ai_response,
@@ -1,10 +1,18 @@
 import os
-import json
+import re
+import sys
+import asyncio
+import hashlib
+import threading
 import time
 import random
-import requests
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import httpx
+import orjson
+from cachetools import TTLCache
+from functools import cached_property, lru_cache
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
+
+from .conversation_store import ConversationStore, create_store
 
 # ---------------------------------------------------
 #  ROCKBOT AI SERVICE - ADVANCED MULTI-AGENT (OpenRouter Edition)
@@ -17,116 +25,388 @@ from typing import List, Dict, Any, Optional
 #  ✅ Customizable model override via parameter
 # ---------------------------------------------------
 
+# ---------------------------------------------------
+#  AGENT DEFINITIONS
+# ---------------------------------------------------
+# Static data, built once at import and shared by every RockbotAI instance
+_AGENT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "general": {
+        "name": "General Assistant",
+        "system_prompt": (
+            "You are Rockbot, a friendly and intelligent AI assistant. "
+            "You help users with general questions, explanations, and everyday reasoning. "
+            "Respond in a concise, informative, and engaging way."
+        ),
+        "capabilities": ("qa", "general_knowledge", "guidance"),
+    },
+    "translator": {
+        "name": "Translator",
+        "system_prompt": (
+            "You are an expert linguist. Translate text between languages fluently, "
+            "keeping tone and cultural context intact. Always clarify both languages."
+        ),
+        "capabilities": ("translation", "language_detection"),
+    },
+    "creative": {
+        "name": "Creative Writer",
+        "system_prompt": (
+            "You are a creative writer and idea generator. "
+            "Help brainstorm stories, poems, dialogues, or marketing ideas. "
+            "Write imaginatively with style and inspiration."
+        ),
+        "capabilities": ("creative_writing", "storytelling", "idea_generation"),
+    },
+    "problem_solver": {
+        "name": "Problem Solver",
+        "system_prompt": (
+            "You are an analytical problem solver. Decompose complex issues "
+            "into clear steps and provide logical, structured, and practical solutions."
+        ),
+        "capabilities": ("reasoning", "step_by_step_guidance", "debugging"),
+    },
+    "task_executor": {
+        "name": "Task Planner",
+        "system_prompt": (
+            "You are an autonomous task execution assistant. "
+            "Plan and organize step-by-step strategies to achieve goals efficiently."
+        ),
+        "capabilities": ("task_planning", "project_management", "execution"),
+    },
+}
+
+# Routing keywords in priority order; the first agent with a hit wins.
+# Keywords must start at a word boundary but may run on, so "fixing", "ideas"
+# and "plans" route like their stems while "prefix" or "explanation" do not.
+_AGENT_KEYWORDS: Dict[str, tuple] = {
+    "translator": ("translate", "translation", "language", "spanish", "french", "german", "chinese", "japanese"),
+    "creative": ("story", "poem", "creative", "imagine", "idea"),
+    "problem_solver": ("problem", "solve", "error", "fix", "how to"),
+    "task_executor": ("plan", "task", "project", "execute", "workflow"),
+}
+
+
+def _keyword_pattern(keywords) -> re.Pattern:
+    # Multi-word phrases tolerate any run of whitespace between words
+    alternation = "|".join(re.escape(k).replace(r"\ ", r"\s+") for k in keywords)
+    return re.compile(rf"\b(?:{alternation})")
+
+
+# One precompiled alternation per agent. A single combined search would return
+# the leftmost keyword rather than the highest-priority agent, and a combined
+# pattern that keeps the priority order benchmarks about 2x slower in CPython.
+_AGENT_ROUTES = [(agent, _keyword_pattern(keywords)) for agent, keywords in _AGENT_KEYWORDS.items()]
+# Longest lowercased message whose routing is memoized
+_ROUTE_CACHE_MAX_LEN = 256
+
+
+# User-prompt templates for the translate and task endpoints
+_TRANS_TMPL = "Translate from {src} to {tgt}:\n\n{text}"
+_TASK_TMPL = (
+    "Analyze and break down this task: {task}\n"
+    "Provide:\n"
+    "1. Task analysis\n"
+    "2. Step-by-step plan\n"
+    "3. Challenges\n"
+    "4. Success criteria"
+)
+
+# Fail fast on stuck connections; only the read waits out a long generation
+_HTTP_TIMEOUT = httpx.Timeout(connect=5, read=60, write=10, pool=5)
+# Longest we will honor a provider's Retry-After before retrying anyway
+_MAX_RETRY_WAIT = 30
+
+
+def _is_retryable(response: httpx.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _retry_wait(response: Optional[httpx.Response], attempt: int) -> float:
+    """Seconds to back off: the provider's Retry-After if given, else exponential with jitter"""
+    try:
+        wait = float(response.headers["Retry-After"])
+    except (AttributeError, KeyError, ValueError):
+        wait = 2 ** attempt + random.random()
+    # Clamp both ways: time.sleep() rejects a negative Retry-After
+    return max(0.0, min(wait, _MAX_RETRY_WAIT))
+
+
+def _parse_completion(response: httpx.Response):
+    data = orjson.loads(response.content)
+    return data["choices"][0]["message"]["content"].strip(), data.get("usage") or {}
+
+
+# Providers that only cache a prompt prefix when it is marked with cache_control
+_CACHE_CONTROL_PREFIXES = ("anthropic/", "google/")
+
+
+# Context windows (tokens) of the routed models, for trimming history
+_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "mistralai/mistral-small": 32000,
+    "meta-llama/llama-3.1-70b-instruct": 131072,
+    "mistralai/mixtral-8x7b": 32768,
+    "anthropic/claude-3.5-sonnet": 200000,
+}
+_DEFAULT_CONTEXT_WINDOW = 32000
+# Role markers and separators the chat format adds around each message
+_MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    # tiktoken is only imported, and its BPE table loaded, on first use. The
+    # table is downloaded on a cold cache; if that or the import fails, counting
+    # falls back to an estimate. The None is cached so it is not retried per request.
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _token_count(text: str) -> int:
+    """Approximate token count of one message; history turns repeat, so memoized"""
+    encoding = _encoding()
+    tokens = len(encoding.encode(text)) if encoding is not None else len(text) // 4 + 1
+    return tokens + _MESSAGE_OVERHEAD
+
+
+def _token_upper_bound(text: str) -> int:
+    # A token is at least one byte and a character at most four
+    return 4 * len(text) + _MESSAGE_OVERHEAD
+
+
+def _cache_breakpoint(text: str) -> List[Dict[str, Any]]:
+    """Anthropic content block that ends a cacheable prompt prefix"""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    """Prompt tokens served from the provider's prefix cache (OpenAI or Anthropic shape)"""
+    details = usage.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0
+
+
+# ---------------------------------------------------
+#  RESULT TYPES
+# ---------------------------------------------------
+# Fixed-shape results; routes turn them into JSON with to_dict(), which leaves
+# out unset fields so error payloads keep their short form.
+class ChatResult(NamedTuple):
+    success: bool
+    response: str
+    agent_used: str
+    agent_name: Optional[str] = None
+    model_used: Optional[str] = None
+    capabilities: Optional[Tuple[str, ...]] = None
+    cached_tokens: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+class TranslationResult(NamedTuple):
+    success: bool
+    translation: Optional[str] = None
+    target_language: Optional[str] = None
+    source_language: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+class TaskResult(NamedTuple):
+    success: bool
+    task_plan: Optional[str] = None
+    agent_used: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+class _Batcher:
+    """Coalesces OpenRouter requests that arrive within ``flush_interval``.
+
+    Each window of up to ``max_batch`` payloads is posted concurrently over the
+    async client, so they go out multiplexed on one HTTP/2 connection. A batcher
+    serves one event loop; RockbotAI builds it alongside that loop's client.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str, flush_interval: float = 0.01, max_batch: int = 16):
+        self.client = client
+        self.url = url
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    async def submit(self, payload: bytes) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((payload, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next window starts filling right away
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        results = await asyncio.gather(
+            *(self.client.post(self.url, content=payload) for payload, _ in batch),
+            return_exceptions=True,
+        )
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
 class RockbotAI:
+    api_url = "https://openrouter.ai/api/v1/chat/completions"
+
+    # Base agent registry
+    agents = _AGENT_PROFILES
+
+    # Recommended models for each use-case
+    model_map = {
+        "general": "gpt-4o-mini",
+        "translator": "mistralai/mistral-small",
+        "creative": "meta-llama/llama-3.1-70b-instruct",
+        "problem_solver": "mistralai/mixtral-8x7b",
+        "task_executor": "anthropic/claude-3.5-sonnet",
+    }
+
+    # System messages never change, so build each agent's once (plain and
+    # with an Anthropic cache breakpoint) and reuse the same dicts per call
+    _sys_msg: Dict[str, Dict[str, Any]] = {
+        agent_type: {"role": "system", "content": sys.intern(agent["system_prompt"])}
+        for agent_type, agent in _AGENT_PROFILES.items()
+    }
+    _cached_sys_msg: Dict[str, Dict[str, Any]] = {
+        agent_type: {"role": "system", "content": _cache_breakpoint(msg["content"])}
+        for agent_type, msg in _sys_msg.items()
+    }
+
     def __init__(self):
-        """Initialize OpenRouter API and configure multi-agent setup."""
-        self.api_key = os.getenv("OPENROUTER_API_KEY")
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
-
-        self.conversation_memory: Dict[int, List[Dict[str, Any]]] = {}
-
-        # Base agent registry
-        self.agents = {
-            "general": self._create_general_agent(),
-            "translator": self._create_translator_agent(),
-            "creative": self._create_creative_agent(),
-            "problem_solver": self._create_problem_solver_agent(),
-            "task_executor": self._create_task_executor_agent(),
-        }
+        """Set up conversation memory; HTTP clients are created on first use."""
+        self.conversation_memory: ConversationStore = create_store()
 
-        # Recommended models for each use-case
-        self.model_map = {
-            "general": "gpt-4o-mini",
-            "translator": "mistralai/mistral-small",
-            "creative": "meta-llama/llama-3.1-70b-instruct",
-            "problem_solver": "mistralai/mixtral-8x7b",
-            "task_executor": "anthropic/claude-3.5-sonnet",
-        }
+        # Replies to identical prompts within five minutes are served locally
+        self._response_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+        self._response_cache_lock = threading.Lock()
+
+        # Per-thread event loop with its async client and batcher, see _ahttp
+        self._async_state = threading.local()
 
     # ---------------------------------------------------
-    #  AGENT DEFINITIONS
+    #  HTTP CLIENTS (lazy)
     # ---------------------------------------------------
-    def _create_general_agent(self):
-        return {
-            "name": "General Assistant",
-            "system_prompt": (
-                "You are Rockbot, a friendly and intelligent AI assistant. "
-                "You help users with general questions, explanations, and everyday reasoning. "
-                "Respond in a concise, informative, and engaging way."
-            ),
-            "capabilities": ["qa", "general_knowledge", "guidance"],
-        }
+    @cached_property
+    def api_key(self) -> Optional[str]:
+        return os.getenv("OPENROUTER_API_KEY")
 
-    def _create_translator_agent(self):
+    @cached_property
+    def _headers(self) -> Dict[str, str]:
         return {
-            "name": "Translator",
-            "system_prompt": (
-                "You are an expert linguist. Translate text between languages fluently, "
-                "keeping tone and cultural context intact. Always clarify both languages."
-            ),
-            "capabilities": ["translation", "language_detection"],
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
         }
 
-    def _create_creative_agent(self):
-        return {
-            "name": "Creative Writer",
-            "system_prompt": (
-                "You are a creative writer and idea generator. "
-                "Help brainstorm stories, poems, dialogues, or marketing ideas. "
-                "Write imaginatively with style and inspiration."
-            ),
-            "capabilities": ["creative_writing", "storytelling", "idea_generation"],
-        }
+    @cached_property
+    def _http(self) -> httpx.Client:
+        # One pooled client for every OpenRouter call: keep-alive and HTTP/2
+        # mean only the first request pays for the TCP + TLS handshake
+        return httpx.Client(http2=True, timeout=_HTTP_TIMEOUT, headers=self._headers)
 
-    def _create_problem_solver_agent(self):
-        return {
-            "name": "Problem Solver",
-            "system_prompt": (
-                "You are an analytical problem solver. Decompose complex issues "
-                "into clear steps and provide logical, structured, and practical solutions."
-            ),
-            "capabilities": ["reasoning", "step_by_step_guidance", "debugging"],
-        }
+    @property
+    def _ahttp(self) -> httpx.AsyncClient:
+        # Async twin so one event loop can keep many OpenRouter calls in flight.
+        # Pooled connections belong to the loop that opened them, so each thread
+        # keeps the client for its running loop and builds a fresh one when
+        # asyncio.run() hands it a new loop
+        return self._loop_state().client
 
-    def _create_task_executor_agent(self):
-        return {
-            "name": "Task Planner",
-            "system_prompt": (
-                "You are an autonomous task execution assistant. "
-                "Plan and organize step-by-step strategies to achieve goals efficiently."
-            ),
-            "capabilities": ["task_planning", "project_management", "execution"],
-        }
+    @property
+    def _batcher(self) -> _Batcher:
+        return self._loop_state().batcher
+
+    def _loop_state(self) -> threading.local:
+        state = self._async_state
+        loop = asyncio.get_running_loop()
+        if getattr(state, "loop", None) is not loop:
+            state.loop = loop
+            state.client = httpx.AsyncClient(http2=True, timeout=_HTTP_TIMEOUT, headers=self._headers)
+            # The batcher's queue, worker and client are all tied to this loop
+            state.batcher = _Batcher(state.client, self.api_url)
+        return state
 
     # ---------------------------------------------------
     #  AGENT DETECTION
     # ---------------------------------------------------
     def select_agent(self, message: str) -> str:
         msg = message.lower()
-        if any(k in msg for k in ["translate", "language", "spanish", "french"]):
-            return "translator"
-        if any(k in msg for k in ["story", "poem", "creative", "imagine", "idea"]):
-            return "creative"
-        if any(k in msg for k in ["problem", "solve", "error", "fix", "how to"]):
-            return "problem_solver"
-        if any(k in msg for k in ["plan", "task", "project", "execute", "workflow"]):
-            return "task_executor"
+        # Short replies ("hi", "continue", "thanks") repeat constantly; long
+        # messages are routed directly so the cache never pins large strings
+        if len(msg) <= _ROUTE_CACHE_MAX_LEN:
+            return self._select_agent_cached(msg)
+        return self._route(msg)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _select_agent_cached(msg_lower: str) -> str:
+        return RockbotAI._route(msg_lower)
+
+    @staticmethod
+    def _route(msg_lower: str) -> str:
+        for agent_type, pattern in _AGENT_ROUTES:
+            if pattern.search(msg_lower):
+                return agent_type
         return "general"
 
     # ---------------------------------------------------
     #  MEMORY HANDLING
     # ---------------------------------------------------
     def get_conversation_context(self, conversation_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        return self.conversation_memory.get(conversation_id, [])[-limit:]
+        return self.conversation_memory.get(conversation_id, limit)
 
     def update_conversation_memory(self, conversation_id: int, role: str, content: str):
-        if conversation_id not in self.conversation_memory:
-            self.conversation_memory[conversation_id] = []
-        self.conversation_memory[conversation_id].append(
-            {"role": role, "content": content, "timestamp": datetime.utcnow().isoformat()}
+        self.conversation_memory.append(
+            conversation_id, {"role": role, "content": content, "ts": time.time_ns()}
         )
-        if len(self.conversation_memory[conversation_id]) > 50:
-            self.conversation_memory[conversation_id] = self.conversation_memory[conversation_id][-50:]
+
+    def record_turn(self, conversation_id: int, user_message: str, assistant_message: str):
+        """Store a user message and its reply in one write, sharing one timestamp"""
+        ts = time.time_ns()
+        self.conversation_memory.extend(conversation_id, [
+            {"role": "user", "content": user_message, "ts": ts},
+            {"role": "assistant", "content": assistant_message, "ts": ts},
+        ])
 
     # ---------------------------------------------------
     #  CORE REQUEST HANDLER (OpenRouter)
@@ -135,116 +415,283 @@ class RockbotAI:
         self, model: str, messages: List[Dict[str, str]],
         temperature=0.7, max_tokens=1000, retries=3
     ):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        # Serialized once; retries resend the same bytes
+        payload = orjson.dumps({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        })
 
-        payload = {
+        # Retry transport errors, 429 and 5xx; any other 4xx is final. The body
+        # is parsed after the loop so a malformed reply is never re-requested.
+        for attempt in range(retries):
+            last_attempt = attempt == retries - 1
+            try:
+                response = self._http.post(self.api_url, content=payload)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                time.sleep(_retry_wait(None, attempt))
+                continue
+            if _is_retryable(response) and not last_attempt:
+                time.sleep(_retry_wait(response, attempt))
+                continue
+            response.raise_for_status()
+            break
+
+        return _parse_completion(response)
+
+    async def _acall_openrouter(
+        self, model: str, messages: List[Dict[str, str]],
+        temperature=0.7, max_tokens=1000, retries=3, batch=False
+    ):
+        # Serialized once; retries resend the same bytes
+        payload = orjson.dumps({
             "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
-        }
+        })
 
         for attempt in range(retries):
+            last_attempt = attempt == retries - 1
             try:
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                if response.status_code == 429:
-                    wait_time = 2 ** attempt + random.random()
-                    time.sleep(wait_time)
-                    continue
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"].strip()
-            except Exception as e:
-                if attempt == retries - 1:
-                    raise e
-                time.sleep(2 ** attempt)
+                if batch:
+                    response = await self._batcher.submit(payload)
+                else:
+                    response = await self._ahttp.post(self.api_url, content=payload)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(_retry_wait(None, attempt))
+                continue
+            if _is_retryable(response) and not last_attempt:
+                await asyncio.sleep(_retry_wait(response, attempt))
+                continue
+            response.raise_for_status()
+            break
+
+        return _parse_completion(response)
 
     # ---------------------------------------------------
     #  GENERIC RESPONSE GENERATION
     # ---------------------------------------------------
+    def _build_messages(
+        self, message: str, conversation_id: Optional[int] = None,
+        agent_type: Optional[str] = None, model: Optional[str] = None,
+        max_tokens: int = 1000
+    ):
+        agent_type = agent_type or self.select_agent(message)
+        agent = self.agents.get(agent_type, self.agents["general"])
+        model = model or self.model_map.get(agent_type, "gpt-4o-mini")
+
+        history = self.get_conversation_context(conversation_id) if conversation_id else []
+        if history:
+            history = self._fit_history(history, agent, message, model, max_tokens)
+        # Send only what the API understands; memory entries also carry a timestamp
+        history = [{"role": turn["role"], "content": turn["content"]} for turn in history]
+        if history and model.startswith(_CACHE_CONTROL_PREFIXES):
+            # Second breakpoint after the prior turns, so the next turn
+            # re-reads the whole history from cache
+            history[-1]["content"] = _cache_breakpoint(history[-1]["content"])
+
+        messages = [self._system_message(agent_type, model), *history, {"role": "user", "content": message}]
+        return messages, agent_type, agent, model
+
+    @staticmethod
+    def _fit_history(history, agent, message, model, max_tokens):
+        """Drop the oldest turns until the prompt leaves room for the reply.
+
+        Saves a round trip the provider would reject for exceeding its context window.
+        """
+        budget = _CONTEXT_WINDOWS.get(model, _DEFAULT_CONTEXT_WINDOW) - max_tokens
+        texts = [agent["system_prompt"], message, *(turn["content"] for turn in history)]
+        # Most prompts fit even at the worst-case token count, so skip tokenizing them
+        if sum(map(_token_upper_bound, texts)) <= budget:
+            return history
+
+        counts = [_token_count(turn["content"]) for turn in history]
+        total = _token_count(agent["system_prompt"]) + _token_count(message) + sum(counts)
+        start = 0
+        while total > budget and start < len(history):
+            total -= counts[start]
+            start += 1
+        return history[start:]
+
+    def _system_message(self, agent_type: str, model: str) -> Dict[str, Any]:
+        # The system prompt is the static head of every request. Anthropic and
+        # Gemini only cache it when asked to; OpenAI-style providers do it on their own
+        table = self._cached_sys_msg if model.startswith(_CACHE_CONTROL_PREFIXES) else self._sys_msg
+        return table.get(agent_type, table["general"])
+
     def generate_response(
         self, message: str, conversation_id: Optional[int] = None,
         agent_type: Optional[str] = None, model: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> ChatResult:
         try:
-            agent_type = agent_type or self.select_agent(message)
-            agent = self.agents.get(agent_type, self.agents["general"])
-            model = model or self.model_map.get(agent_type, "gpt-4o-mini")
-
-            messages = [{"role": "system", "content": agent["system_prompt"]}]
-            if conversation_id:
-                messages.extend(self.get_conversation_context(conversation_id))
-            messages.append({"role": "user", "content": message})
-
-            ai_response = self._call_openrouter(model, messages)
-
-            if conversation_id:
-                self.update_conversation_memory(conversation_id, "user", message)
-                self.update_conversation_memory(conversation_id, "assistant", ai_response)
-
-            return {
-                "success": True,
-                "response": ai_response,
-                "agent_used": agent_type,
-                "agent_name": agent["name"],
-                "model_used": model,
-                "capabilities": agent["capabilities"],
-            }
+            messages, agent_type, agent, model = self._build_messages(message, conversation_id, agent_type, model)
+            key = self._response_key(model, messages)
+            ai_response = self._cached_response(key)
+            if ai_response is not None:
+                return self._finish_response(message, conversation_id, agent_type, agent, model, ai_response, {}, True)
+            ai_response, usage = self._call_openrouter(model, messages)
+            self._store_response(key, ai_response)
+            return self._finish_response(message, conversation_id, agent_type, agent, model, ai_response, usage)
         except Exception as e:
-            return {
-                "success": False,
-                "response": f"Error: {str(e)}",
-                "agent_used": agent_type or "general",
-                "error": str(e),
-            }
+            return self._error_response(e, agent_type)
+
+    async def agenerate_response(
+        self, message: str, conversation_id: Optional[int] = None,
+        agent_type: Optional[str] = None, model: Optional[str] = None,
+        batch: bool = False
+    ) -> ChatResult:
+        """Async counterpart of generate_response for event-loop callers.
+
+        ``batch=True`` sends the request through the micro-batcher, trading up
+        to 10 ms of latency for throughput under bursts; interactive callers
+        should keep the default.
+        """
+        try:
+            messages, agent_type, agent, model = self._build_messages(message, conversation_id, agent_type, model)
+            key = self._response_key(model, messages)
+            ai_response = self._cached_response(key)
+            if ai_response is not None:
+                return self._finish_response(message, conversation_id, agent_type, agent, model, ai_response, {}, True)
+            ai_response, usage = await self._acall_openrouter(model, messages, batch=batch)
+            self._store_response(key, ai_response)
+            return self._finish_response(message, conversation_id, agent_type, agent, model, ai_response, usage)
+        except Exception as e:
+            return self._error_response(e, agent_type)
+
+    @staticmethod
+    def _response_key(model: str, messages: List[Dict[str, Any]]) -> bytes:
+        return hashlib.blake2b(orjson.dumps([model, messages]), digest_size=16).digest()
+
+    def _cached_response(self, key: bytes) -> Optional[str]:
+        with self._response_cache_lock:
+            return self._response_cache.get(key)
+
+    def _store_response(self, key: bytes, ai_response: str):
+        with self._response_cache_lock:
+            self._response_cache[key] = ai_response
+
+    def _finish_response(
+        self, message, conversation_id, agent_type, agent, model, ai_response, usage, cache_hit=False
+    ) -> ChatResult:
+        if conversation_id:
+            self.record_turn(conversation_id, message, ai_response)
+
+        return ChatResult(
+            success=True,
+            response=ai_response,
+            agent_used=agent_type,
+            agent_name=agent["name"],
+            model_used=model,
+            capabilities=agent["capabilities"],
+            cached_tokens=_cached_tokens(usage),
+            cache_hit=cache_hit,
+        )
+
+    @staticmethod
+    def _error_response(e: Exception, agent_type: Optional[str]) -> ChatResult:
+        return ChatResult(
+            success=False,
+            response=f"Error: {str(e)}",
+            agent_used=agent_type or "general",
+            error=str(e),
+        )
+
+    # ---------------------------------------------------
+    #  STREAMING RESPONSE GENERATION
+    # ---------------------------------------------------
+    def _stream_openrouter(
+        self, model: str, messages: List[Dict[str, str]],
+        temperature=0.7, max_tokens=1000
+    ) -> Iterator[str]:
+        payload = orjson.dumps({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        })
+
+        with self._http.stream("POST", self.api_url, content=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                # Skip blank separators and SSE comments (OpenRouter keep-alives)
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].lstrip()
+                if data == "[DONE]":
+                    break
+                event = orjson.loads(data)
+                # Errors after the 200 has been sent arrive as an in-band event
+                if "error" in event:
+                    raise RuntimeError(event["error"].get("message", "Stream interrupted by provider"))
+                # Usage-only chunks carry an empty choices list
+                choices = event.get("choices")
+                if not choices:
+                    continue
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def generate_response_stream(
+        self, message: str, conversation_id: Optional[int] = None,
+        agent_type: Optional[str] = None, model: Optional[str] = None
+    ) -> Iterator[str]:
+        """Yield the reply in chunks as the model produces them.
+
+        Conversation memory is only updated once the stream completes.
+        """
+        messages, agent_type, agent, model = self._build_messages(message, conversation_id, agent_type, model)
+
+        chunks = []
+        for chunk in self._stream_openrouter(model, messages):
+            chunks.append(chunk)
+            yield chunk
+
+        if conversation_id:
+            self.record_turn(conversation_id, message, "".join(chunks))
 
     # ---------------------------------------------------
     #  TRANSLATION AGENT
     # ---------------------------------------------------
-    def translate_text(self, text: str, target_language: str, source_language: str = "auto") -> Dict[str, Any]:
+    def translate_text(self, text: str, target_language: str, source_language: str = "auto") -> TranslationResult:
         try:
-            prompt = f"Translate from {source_language} to {target_language}:\n\n{text}"
+            prompt = _TRANS_TMPL.format(src=source_language, tgt=target_language, text=text)
+            model = self.model_map["translator"]
             messages = [
-                {"role": "system", "content": self.agents["translator"]["system_prompt"]},
+                self._system_message("translator", model),
                 {"role": "user", "content": prompt},
             ]
-            translated = self._call_openrouter(self.model_map["translator"], messages, temperature=0.3)
-            return {
-                "success": True,
-                "translation": translated,
-                "target_language": target_language,
-                "source_language": source_language,
-            }
+            translated, _ = self._call_openrouter(model, messages, temperature=0.3)
+            return TranslationResult(
+                success=True,
+                translation=translated,
+                target_language=target_language,
+                source_language=source_language,
+            )
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            return TranslationResult(success=False, error=str(e))
 
     # ---------------------------------------------------
     #  TASK EXECUTION AGENT
     # ---------------------------------------------------
-    def execute_autonomous_task(self, task_description: str) -> Dict[str, Any]:
+    def execute_autonomous_task(self, task_description: str) -> TaskResult:
         try:
-            prompt = (
-                f"Analyze and break down this task: {task_description}\n"
-                f"Provide:\n"
-                f"1. Task analysis\n"
-                f"2. Step-by-step plan\n"
-                f"3. Challenges\n"
-                f"4. Success criteria"
-            )
+            prompt = _TASK_TMPL.format(task=task_description)
+            model = self.model_map["task_executor"]
             messages = [
-                {"role": "system", "content": self.agents["task_executor"]["system_prompt"]},
+                self._system_message("task_executor", model),
                 {"role": "user", "content": prompt},
             ]
-            plan = self._call_openrouter(self.model_map["task_executor"], messages, temperature=0.5, max_tokens=1200)
-            return {
-                "success": True,
-                "task_plan": plan,
-                "agent_used": "task_executor",
-            }
+            plan, _ = self._call_openrouter(model, messages, temperature=0.5, max_tokens=1200)
+            return TaskResult(success=True, task_plan=plan, agent_used="task_executor")
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            return TaskResult(success=False, error=str(e))
 
 
 # ---------------------------------------------------
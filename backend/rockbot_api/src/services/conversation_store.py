@@ -0,0 +1,85 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import List, Dict, Any
+
+import orjson
+from cachetools import LRUCache
+
+# ---------------------------------------------------
+#  CONVERSATION MEMORY STORES
+# ---------------------------------------------------
+#  InMemoryStore - per-process LRU of conversations (default)
+#  RedisStore    - shared by every worker, set ROCKBOT_MEMORY_BACKEND=redis
+# ---------------------------------------------------
+
+MAX_TURNS = 50
+
+
+class ConversationStore(ABC):
+    """Recent turns per conversation, capped at MAX_TURNS.
+
+    Backends implement get() and extend(); append() is a one-message extend.
+    """
+
+    @abstractmethod
+    def get(self, conversation_id: int, limit: int = MAX_TURNS) -> List[Dict[str, Any]]:
+        ...
+
+    def append(self, conversation_id: int, message: Dict[str, Any]):
+        self.extend(conversation_id, [message])
+
+    @abstractmethod
+    def extend(self, conversation_id: int, messages: List[Dict[str, Any]]):
+        ...
+
+
+class InMemoryStore(ConversationStore):
+    def __init__(self, max_conversations: int = 10_000):
+        # Least recently used conversations are evicted once the cap is hit
+        self._conversations: LRUCache = LRUCache(maxsize=max_conversations)
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: int, limit: int = MAX_TURNS) -> List[Dict[str, Any]]:
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            return list(turns)[-limit:] if turns else []
+
+    def extend(self, conversation_id: int, messages: List[Dict[str, Any]]):
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            if turns is None:
+                # deque drops the oldest entry itself once a conversation passes MAX_TURNS
+                turns = self._conversations[conversation_id] = deque(maxlen=MAX_TURNS)
+            turns.extend(messages)
+
+
+class RedisStore(ConversationStore):
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _key(conversation_id: int) -> str:
+        return f"conv:{conversation_id}"
+
+    def get(self, conversation_id: int, limit: int = MAX_TURNS) -> List[Dict[str, Any]]:
+        return [orjson.loads(raw) for raw in self._redis.lrange(self._key(conversation_id), -limit, -1)]
+
+    def extend(self, conversation_id: int, messages: List[Dict[str, Any]]):
+        key = self._key(conversation_id)
+        # Push and trim in one MULTI so readers never see more than MAX_TURNS
+        pipe = self._redis.pipeline()
+        pipe.rpush(key, *(orjson.dumps(message) for message in messages))
+        pipe.ltrim(key, -MAX_TURNS, -1)
+        pipe.execute()
+
+
+def create_store() -> ConversationStore:
+    backend = os.getenv("ROCKBOT_MEMORY_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        raise ValueError(f"Unknown ROCKBOT_MEMORY_BACKEND: {backend}")
+    return InMemoryStore()